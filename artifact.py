@@ -0,0 +1,61 @@
+"""
+Model artifact persistence:
+- One pickle holding M1, M2 (with their calibrators) and the segment fallback table
+- `model_id` (hash of the pickled models) identifies the artifact, so offline tables built
+  from it can be matched to the served models
+- Loading never imports this package's training modules (data_gen, models); sklearn and
+  xgboost still pull in their own dependencies when the pipelines are unpickled
+"""
+import hashlib
+import pickle
+from typing import Any, Dict
+
+ARTIFACT_VERSION = 1
+
+
+def save_models(path: str, propensity_model, price_model, fallback_table=None) -> str:
+    models_blob = pickle.dumps((propensity_model, price_model), protocol=pickle.HIGHEST_PROTOCOL)
+    model_id = hashlib.sha256(models_blob).hexdigest()[:16]
+    bundle = {
+        "version": ARTIFACT_VERSION,
+        "model_id": model_id,
+        "propensity_model": propensity_model,
+        "price_model": price_model,
+        "fallback_table": fallback_table,
+    }
+    with open(path, "wb") as f:
+        pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return model_id
+
+
+def load_models(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        bundle = pickle.load(f)
+    if bundle.get("version") != ARTIFACT_VERSION:
+        raise ValueError(
+            f"Unsupported model artifact version {bundle.get('version')} (expected {ARTIFACT_VERSION})"
+        )
+    return bundle
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    from .data_gen import generate_synthetic_training
+    from .fallback import build_segment_fallback_table
+    from .models import train_price_elasticity_model, train_propensity_model
+
+    parser = argparse.ArgumentParser(description="Train M1/M2 and write a serving artifact")
+    parser.add_argument("--out", default="models.pkl")
+    parser.add_argument("--n-bookings", type=int, default=int(os.getenv("TRAIN_N_BOOKINGS", "3000")))
+    parser.add_argument("--encoding", choices=["onehot", "native"], default="onehot")
+    parser.add_argument("--calibration", choices=["isotonic", "platt", "none"], default="isotonic")
+    args = parser.parse_args()
+    calibration = None if args.calibration == "none" else args.calibration
+
+    df = generate_synthetic_training(n_bookings=args.n_bookings, typed=True)
+    prop = train_propensity_model(df, encoding=args.encoding, calibration=calibration)
+    price = train_price_elasticity_model(df, encoding=args.encoding, calibration=calibration)
+    model_id = save_models(args.out, prop, price, build_segment_fallback_table(df, price))
+    print(f"[artifact] Wrote {args.out} (model_id={model_id})")
@@ -0,0 +1,80 @@
+"""
+One-hot vs native categorical XGBoost pipelines at growing vocabulary sizes.
+
+The synthetic frame is widened by splitting each route and add-on into `vocab` variants
+(the label signal is unchanged), then both M2 pipelines are trained and compared on
+training time, pickled model size and single-request inference latency.
+
+Usage (from the repo root):
+    python benchmarks/categorical_encoding.py --vocab 8,100,1000,5000 --n-bookings 20000
+"""
+import argparse
+import importlib
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(REPO_DIR))
+PKG = os.path.basename(REPO_DIR)
+
+data_gen = importlib.import_module(f"{PKG}.data_gen")
+features = importlib.import_module(f"{PKG}.features")
+models = importlib.import_module(f"{PKG}.models")
+
+
+def widen_vocab(df: pd.DataFrame, vocab: int, seed: int = 0) -> pd.DataFrame:
+    """Split route_od / addon_id into ~`vocab` distinct values each."""
+    rng = np.random.default_rng(seed)
+    out = df.copy()
+    for c in ("route_od", "addon_id"):
+        base = out[c].astype(str)
+        per_value = max(1, vocab // base.nunique())
+        out[c] = (base + "_" + rng.integers(0, per_value, len(out)).astype(str)).astype("category")
+    return out
+
+
+def _latency_ms(pipe, X: pd.DataFrame, reps: int = 200) -> float:
+    pipe.predict_proba(X)  # warm
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        pipe.predict_proba(X)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times) * 1e3)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vocab", default="8,100,1000")
+    parser.add_argument("--n-bookings", type=int, default=20000)
+    args = parser.parse_args()
+
+    base = data_gen.generate_synthetic_training(n_bookings=args.n_bookings, typed=True)
+    rows = []
+    for vocab in (int(v) for v in args.vocab.split(",")):
+        df = widen_vocab(base, vocab)
+        # One request's worth of rows: 5 add-ons x 6 price buckets
+        request_X = df.reindex(columns=features.CATEGORICAL + features.PRICE_NUMERIC).head(30)
+        features.add_price_interactions(request_X)
+        for encoding in models.ENCODINGS:
+            t0 = time.perf_counter()
+            pipe = models.train_price_elasticity_model(df, encoding=encoding)
+            train_s = time.perf_counter() - t0
+            rows.append({
+                "vocab": vocab,
+                "encoding": encoding,
+                "n_features": len(pipe.named_steps["prep"].get_feature_names_out()),
+                "train_s": train_s,
+                "model_mb": len(pickle.dumps(pipe)) / 1e6,
+                "predict_ms_30rows": _latency_ms(pipe, request_X),
+            })
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Concurrency stress test for /recommend through Flask's test client.
+
+Starts many threads against a cold server: all of them hit the first (model-loading)
+request together, then keep issuing requests. Reports how many times models were loaded
+(should be exactly 1) and latency percentiles per wave, which should be stable after warmup.
+
+Usage (from the repo root):
+    SERVE_THREADS=4 TRAIN_N_BOOKINGS=1000 python benchmarks/concurrent_recommend.py --threads 32 --waves 5
+"""
+import argparse
+import importlib
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(REPO_DIR))
+PKG = os.path.basename(REPO_DIR)
+
+PAYLOAD = {
+    "context": {
+        "booking_id": "B_stress",
+        "route_od": "ORD_SFO",
+        "flight_duration_min": 270,
+        "dep_hour_local": 9,
+        "pax_count": 2,
+        "days_to_departure": 14,
+        "payment_type": "credit_card",
+        "loyalty_tier": "Gold",
+        "season": "Q4",
+        "purchased_any_addon": 0,
+        "used_upgrade": 0,
+    },
+    "price_list_map": {
+        "seat_upgrade": 30.0,
+        "baggage_bundle": 20.0,
+        "lounge_access": 25.0,
+        "wifi": 15.0,
+        "priority_boarding": 10.0,
+    },
+    "latency_budget_ms": 1e9,  # measure full scoring, not degraded tiers
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--waves", type=int, default=5)
+    args = parser.parse_args()
+
+    serve = importlib.import_module(f"{PKG}.serve")
+    latencies = [[] for _ in range(args.waves)]
+    errors = []
+    barrier = threading.Barrier(args.threads)
+
+    def worker() -> None:
+        client = serve.app.test_client()
+        for wave in range(args.waves):
+            barrier.wait()
+            t0 = time.perf_counter()
+            resp = client.post("/recommend", json=PAYLOAD)
+            latencies[wave].append((time.perf_counter() - t0) * 1e3)
+            if resp.status_code != 200:
+                errors.append(resp.get_json())
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"model loads: {serve.MODELS.load_count}  errors: {len(errors)}  "
+          f"serve threads: {serve.SERVE_THREADS or 'default'}")
+    for wave, lat in enumerate(latencies):
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        label = "cold" if wave == 0 else f"wave {wave}"
+        print(f"{label:>7}: p50={p50:8.1f} ms  p95={p95:8.1f} ms  p99={p99:8.1f} ms")
+    if errors:
+        print("first error:", errors[0])
+    if serve.MODELS.load_count != 1:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Import-time benchmark for the serving and training entry points.
+
+Runs each import in a fresh interpreter with `-X importtime`, reports wall time (best of N)
+and the heaviest top-level packages by summed self import time.
+
+Usage (from the repo root):
+    python benchmarks/import_time.py --repeat 5 --top 10
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARENT_DIR = os.path.dirname(REPO_DIR)
+PKG = os.path.basename(REPO_DIR)
+
+# name -> modules imported (relative to the package)
+SCENARIOS: Dict[str, List[str]] = {
+    "serve (scoring-only)": ["serve"],
+    "serve + training stack": ["serve", "data_gen", "models", "fallback"],
+    "models (training)": ["models"],
+}
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+\d+\s+\|\s*(\S+)")
+
+
+def _run(modules: List[str], importtime: bool) -> Tuple[float, str]:
+    stmt = "; ".join(f"import {PKG}.{m}" for m in modules)
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", stmt]
+    t0 = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=PARENT_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if proc.returncode != 0:
+        raise RuntimeError(f"`{stmt}` failed:\n{proc.stderr}")
+    return elapsed, proc.stderr
+
+
+def _top_level_breakdown(stderr: str) -> Dict[str, int]:
+    """Self import time in microseconds summed per top-level package."""
+    totals: Dict[str, int] = defaultdict(int)
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            totals[m.group(2).split(".")[0]] += int(m.group(1))
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for name, modules in SCENARIOS.items():
+        walls = [_run(modules, importtime=False)[0] for _ in range(args.repeat)]
+        _, stderr = _run(modules, importtime=True)
+        breakdown = sorted(_top_level_breakdown(stderr).items(), key=lambda kv: kv[1], reverse=True)
+
+        print(f"\n== {name}: best {min(walls) * 1e3:.0f} ms, median "
+              f"{sorted(walls)[len(walls) // 2] * 1e3:.0f} ms (interpreter start included)")
+        for pkg, us in breakdown[: args.top]:
+            print(f"   {us / 1e3:8.1f} ms  {pkg}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Peak-RSS benchmark for a training run: baseline generator + trainers vs the current ones.
+
+"baseline" runs the data generator and M1/M2 trainers exactly as they were at
+`--baseline-rev` (default: the repository's first commit: object-dtype frame, float64
+one-hot preprocessing, per-fold copies), exported from git into a temporary package.
+"current" runs this checkout with the typed frame. Each mode runs in a fresh interpreter
+(so peaks don't mix) and reports the frame's in-memory size, peak RSS after data
+generation and peak RSS after training M1 + M2.
+
+Usage (from the repo root):
+    python benchmarks/training_memory.py --n-bookings 1000000
+    python benchmarks/training_memory.py --n-bookings 1000000 --no-train
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARENT_DIR = os.path.dirname(REPO_DIR)
+PKG = os.path.basename(REPO_DIR)
+BASELINE_PKG = "addon_boost_baseline"
+
+_CHILD = """
+import json, resource, sys, time
+from {pkg}.data_gen import generate_synthetic_training
+from {pkg}.models import train_price_elasticity_model, train_propensity_model
+
+def peak_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+t0 = time.perf_counter()
+df = generate_synthetic_training(n_bookings={n}{gen_kwargs})
+out = {{"frame_mb": df.memory_usage(deep=True).sum() / 1e6, "gen_peak_mb": peak_mb(),
+        "gen_s": time.perf_counter() - t0}}
+if {train}:
+    t0 = time.perf_counter()
+    train_propensity_model(df)
+    train_price_elasticity_model(df)
+    out["train_peak_mb"] = peak_mb()
+    out["train_s"] = time.perf_counter() - t0
+print("RESULT " + json.dumps(out))
+"""
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=REPO_DIR, capture_output=True, text=True, check=True
+    ).stdout
+
+
+def _export_baseline(rev: str, dest: str) -> None:
+    """Write the top-level modules of `rev` into `dest/BASELINE_PKG`."""
+    pkg_dir = os.path.join(dest, BASELINE_PKG)
+    os.makedirs(pkg_dir)
+    for name in _git("ls-tree", "--name-only", rev).split():
+        if name.endswith(".py"):
+            with open(os.path.join(pkg_dir, name), "w") as f:
+                f.write(_git("show", f"{rev}:{name}"))
+
+
+def _run(pkg: str, cwd: str, n: int, gen_kwargs: str, train: bool) -> dict:
+    code = _CHILD.format(pkg=pkg, n=n, gen_kwargs=gen_kwargs, train=train)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    line = next(l for l in proc.stdout.splitlines() if l.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--n-bookings", type=int, default=1_000_000)
+    parser.add_argument("--no-train", action="store_true", help="only measure data generation")
+    parser.add_argument("--baseline-rev", default=None,
+                        help="git revision for the baseline run (default: first commit)")
+    args = parser.parse_args()
+    rev = args.baseline_rev or _git("rev-list", "--max-parents=0", "HEAD").split()[0]
+    train = not args.no_train
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        _export_baseline(rev, tmp)
+        results["baseline"] = _run(BASELINE_PKG, tmp, args.n_bookings, "", train)
+    results["current"] = _run(PKG, PARENT_DIR, args.n_bookings, ", typed=True", train)
+
+    print(f"baseline = {rev[:12]}, current = working tree, n_bookings = {args.n_bookings}")
+    print(f"{'metric':<16}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for k in results["baseline"]:
+        base, cur = results["baseline"][k], results["current"][k]
+        print(f"{k:<16}{base:>12.1f}{cur:>12.1f}{base / max(cur, 1e-9):>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
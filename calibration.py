@@ -0,0 +1,114 @@
+"""
+Probability calibration per add-on:
+- Fitted once on the out-of-fold predictions GroupKFold already produces during training
+  (isotonic or Platt), so there is no CalibratedClassifierCV refit
+- Each add-on's calibration map is resampled onto a fixed grid over [0, 1] and stored as one
+  (n_addons + 1, n_knots) float32 array; the last row is a global map for unseen add-ons
+- Serving applies it with a single gather + linear interpolation (no per-row Python), and
+  only to rows whose price was already chosen on the raw score
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+CALIBRATION_METHODS = ("isotonic", "platt")
+
+
+@dataclass
+class ProbabilityCalibrator:
+    method: str
+    addon_index: Dict[str, int]
+    table: np.ndarray  # (n_addons + 1, n_knots), float32
+
+    # add-on id -> table row as a pandas Index, for vectorized get_indexer lookups
+    row_index: pd.Index = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.row_index = pd.Index(sorted(self.addon_index, key=self.addon_index.get))
+
+    def transform(self, proba: np.ndarray, addon_ids) -> np.ndarray:
+        proba = np.asarray(proba, dtype=np.float64)
+        rows = self.row_index.get_indexer(pd.Index(addon_ids).astype(str))
+        rows[rows < 0] = len(self.addon_index)  # unseen add-ons use the global map
+        n_knots = self.table.shape[1]
+        pos = np.clip(proba, 0.0, 1.0) * (n_knots - 1)
+        lo = np.minimum(pos.astype(np.intp), n_knots - 2)
+        frac = pos - lo
+        return self.table[rows, lo] * (1.0 - frac) + self.table[rows, lo + 1] * frac
+
+
+def _logit(p: np.ndarray, eps: float = 1e-6) -> np.ndarray:
+    p = np.clip(p, eps, 1 - eps)
+    return np.log(p / (1 - p))
+
+
+def _fit_map(proba: np.ndarray, y: np.ndarray, method: str, grid: np.ndarray) -> np.ndarray:
+    """Fit one calibration map and evaluate it on `grid`."""
+    if method == "isotonic":
+        from sklearn.isotonic import IsotonicRegression
+
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip")
+        iso.fit(proba, y)
+        return iso.predict(grid)
+
+    from sklearn.linear_model import LogisticRegression
+
+    lr = LogisticRegression(C=1e6)
+    lr.fit(_logit(proba).reshape(-1, 1), y)
+    return lr.predict_proba(_logit(grid).reshape(-1, 1))[:, 1]
+
+
+def fit_calibrator(
+    oof_proba: np.ndarray,
+    y: np.ndarray,
+    addon_ids,
+    method: str = "isotonic",
+    n_knots: int = 1001,
+    min_samples: int = 200,
+) -> ProbabilityCalibrator:
+    """
+    Fit per-add-on calibration on out-of-fold predictions. Add-ons with fewer than
+    `min_samples` rows (or a single class) share the global map.
+    """
+    if method not in CALIBRATION_METHODS:
+        raise ValueError(f"Unknown calibration method {method!r}; expected one of {CALIBRATION_METHODS}")
+
+    oof_proba = np.asarray(oof_proba, dtype=np.float64)
+    y = np.asarray(y)
+    addon_ids = np.asarray([str(a) for a in addon_ids])
+    grid = np.linspace(0.0, 1.0, n_knots)
+
+    global_map = _fit_map(oof_proba, y, method, grid)
+    addons: List[str] = sorted(set(addon_ids))
+    table = np.empty((len(addons) + 1, n_knots), dtype=np.float32)
+    for i, addon in enumerate(addons):
+        mask = addon_ids == addon
+        if mask.sum() >= min_samples and len(np.unique(y[mask])) == 2:
+            table[i] = _fit_map(oof_proba[mask], y[mask], method, grid)
+        else:
+            table[i] = global_map
+    table[-1] = global_map
+
+    return ProbabilityCalibrator(
+        method=method,
+        addon_index={a: i for i, a in enumerate(addons)},
+        table=table,
+    )
+
+
+def raw_purchase_proba(model, X) -> np.ndarray:
+    """Uncalibrated P(purchase): use this to choose between prices of the same add-on."""
+    return model.predict_proba(X)[:, 1]
+
+
+def calibrator_of(model):
+    """The calibrator training attached to `model`, or None."""
+    return getattr(model, "calibrator_", None)
+
+
+def calibrate(calibrator, proba: np.ndarray, addon_ids) -> np.ndarray:
+    if calibrator is None:
+        return np.asarray(proba, dtype=np.float64)
+    return calibrator.transform(proba, addon_ids)
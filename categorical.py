@@ -0,0 +1,35 @@
+"""
+Native categorical encoding for XGBoost (alternative to one-hot ColumnTransformers):
+- Fit learns a sorted vocabulary per categorical column; that vocabulary IS the code mapping
+  and is pickled with the pipeline, so train and serve always agree on codes
+- Transform emits pandas categoricals over the fixed vocabulary (unseen values -> missing)
+  plus float32 numerics, for XGBClassifier(enable_categorical=True)
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+
+
+class NativeCategoricalEncoder(BaseEstimator, TransformerMixin):
+    def __init__(self, categorical_cols: List[str], numeric_cols: List[str]):
+        self.categorical_cols = categorical_cols
+        self.numeric_cols = numeric_cols
+
+    def fit(self, X: pd.DataFrame, y=None) -> "NativeCategoricalEncoder":
+        self.categories_: Dict[str, List[str]] = {
+            c: sorted(map(str, X[c].dropna().unique())) for c in self.categorical_cols
+        }
+        return self
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        cols: Dict[str, object] = {}
+        for c in self.categorical_cols:
+            cols[c] = pd.Categorical(X[c], categories=self.categories_[c])
+        for c in self.numeric_cols:
+            cols[c] = X[c].to_numpy(dtype=np.float32)
+        return pd.DataFrame(cols, index=X.index)
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return np.asarray(self.categorical_cols + self.numeric_cols, dtype=object)
@@ -22,3 +22,12 @@ class Policy:
     min_margin_pct: float = 0.1           # e.g., >= 10% margin
     max_discount_pct: float = 0.5         # e.g., <= 50% off list
     fairness_block_cc_specific: bool = True  # placeholder for policy hooks
+
+# Per-request latency budget for /recommend in ms (payload `latency_budget_ms` overrides)
+LATENCY_BUDGET_MS = 150.0
+
+# Cold-start estimate of one model scoring call in ms (refined online from observed latencies)
+DEFAULT_SCORE_CALL_MS = 2.0
+
+# Number of price buckets kept by the coarse-grid degraded tier
+COARSE_GRID_SIZE = 3
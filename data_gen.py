@@ -1,7 +1,8 @@
-from typing import Dict, List
+from typing import Dict
 import numpy as np
 import pandas as pd
 from .config import RNG_SEED, ADDON_META
+from .features import to_training_frame
 
 RNG = np.random.default_rng(RNG_SEED)
 
@@ -33,10 +34,43 @@ def _route_mix(route: str) -> float:
         return 0.15
     return 0.1
 
-def generate_synthetic_training(n_bookings: int = 4000, price_jitter: float = 0.3) -> pd.DataFrame:
-    rows: List[Dict] = []
+def generate_synthetic_training(
+    n_bookings: int = 4000, price_jitter: float = 0.3, typed: bool = False
+) -> pd.DataFrame:
+    """
+    Rows are accumulated into preallocated column arrays (same RNG draw order as before).
+    typed=True returns the compact training frame from `features.to_training_frame`
+    (integer booking keys, categoricals, float32 numerics); otherwise the legacy
+    string/object frame.
+    """
+    addons = list(ADDON_META.items())
+    n_rows = n_bookings * len(addons)
+    route_idx = {r: i for i, r in enumerate(ROUTES)}
+    pay_idx = {p: i for i, p in enumerate(PAYMENT_TYPES)}
+    tier_idx = {t: i for i, t in enumerate(TIERS)}
+    season_idx = {q: i for i, q in enumerate(SEASONS)}
+
+    cols: Dict[str, np.ndarray] = {
+        "booking_id": np.empty(n_rows, dtype=np.int64),
+        "addon_id": np.empty(n_rows, dtype=np.int8),
+        "label_purchase": np.empty(n_rows, dtype=np.int8),
+        "price_offered": np.empty(n_rows, dtype=np.float64),
+        "price_list": np.empty(n_rows, dtype=np.float64),
+        "discount_pct": np.empty(n_rows, dtype=np.float64),
+        "route_od": np.empty(n_rows, dtype=np.int8),
+        "flight_duration_min": np.empty(n_rows, dtype=np.float64),
+        "dep_hour_local": np.empty(n_rows, dtype=np.int64),
+        "pax_count": np.empty(n_rows, dtype=np.int64),
+        "days_to_departure": np.empty(n_rows, dtype=np.int64),
+        "payment_type": np.empty(n_rows, dtype=np.int8),
+        "loyalty_tier": np.empty(n_rows, dtype=np.int8),
+        "season": np.empty(n_rows, dtype=np.int8),
+        "purchased_any_addon": np.empty(n_rows, dtype=np.int64),
+        "used_upgrade": np.empty(n_rows, dtype=np.int64),
+    }
+
+    r = 0
     for i in range(n_bookings):
-        b = f"B{100000+i}"
         route = RNG.choice(ROUTES)
         flight_duration_min = int(RNG.normal(210, 60))
         dep_hour_local = int(RNG.integers(5, 22))
@@ -48,7 +82,7 @@ def generate_synthetic_training(n_bookings: int = 4000, price_jitter: float = 0.
         purchased_any_addon = int(RNG.random() < 0.25)
         used_upgrade = int(RNG.random() < 0.12)
 
-        for addon_id, meta in ADDON_META.items():
+        for a, (addon_id, meta) in enumerate(addons):
             list_price = meta["base_price"] * (1.0 + 0.2 * RNG.normal(0, 1))
             offered_price = max(1.0, list_price * (1.0 - price_jitter*RNG.random()))
             discount_pct = (list_price - offered_price) / max(list_price, 1e-6)
@@ -72,22 +106,38 @@ def generate_synthetic_training(n_bookings: int = 4000, price_jitter: float = 0.
             prob = 1 / (1 + np.exp(-logit))
             label_purchase = int(RNG.random() < prob)
 
-            rows.append({
-                "booking_id": b,
-                "addon_id": addon_id,
-                "label_purchase": label_purchase,
-                "price_offered": float(offered_price),
-                "price_list": float(list_price),
-                "discount_pct": float(discount_pct),
-                "route_od": route,
-                "flight_duration_min": float(flight_duration_min),
-                "dep_hour_local": int(dep_hour_local),
-                "pax_count": int(pax_count),
-                "days_to_departure": int(days_to_departure),
-                "payment_type": payment_type,
-                "loyalty_tier": loyalty_tier,
-                "season": season,
-                "purchased_any_addon": int(purchased_any_addon),
-                "used_upgrade": int(used_upgrade),
-            })
-    return pd.DataFrame(rows)
+            cols["booking_id"][r] = 100000 + i
+            cols["addon_id"][r] = a
+            cols["label_purchase"][r] = label_purchase
+            cols["price_offered"][r] = offered_price
+            cols["price_list"][r] = list_price
+            cols["discount_pct"][r] = discount_pct
+            cols["route_od"][r] = route_idx[route]
+            cols["flight_duration_min"][r] = flight_duration_min
+            cols["dep_hour_local"][r] = dep_hour_local
+            cols["pax_count"][r] = pax_count
+            cols["days_to_departure"][r] = days_to_departure
+            cols["payment_type"][r] = pay_idx[payment_type]
+            cols["loyalty_tier"][r] = tier_idx[loyalty_tier]
+            cols["season"][r] = season_idx[season]
+            cols["purchased_any_addon"][r] = purchased_any_addon
+            cols["used_upgrade"][r] = used_upgrade
+            r += 1
+
+    vocab = {
+        "addon_id": [k for k, _ in addons],
+        "route_od": ROUTES,
+        "payment_type": PAYMENT_TYPES,
+        "loyalty_tier": TIERS,
+        "season": SEASONS,
+    }
+    if typed:
+        for c, cats in vocab.items():
+            cols[c] = pd.Categorical.from_codes(cols[c], categories=cats)
+        return to_training_frame(pd.DataFrame(cols, copy=False))
+
+    for c, cats in vocab.items():
+        cols[c] = np.asarray(cats, dtype=object)[cols[c]]
+    cols["booking_id"] = np.array([f"B{b}" for b in cols["booking_id"]], dtype=object)
+    cols["label_purchase"] = cols["label_purchase"].astype(np.int64)
+    return pd.DataFrame(cols, copy=False)
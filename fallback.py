@@ -0,0 +1,106 @@
+"""
+Per-segment fallback offers (last-resort serving tier under a latency budget):
+- Keyed on (route_od, loyalty_tier, payment_type, season)
+- Each segment stores raw M2 purchase probabilities over a price grid per add-on, scored once
+  on the segment's median numeric context from the training frame; the model's calibrator is
+  kept alongside and applied to the chosen prices only
+- Lookup re-applies the request's policy, so serving needs no model call; it is only used for
+  requests whose list prices match the ADDON_META base prices it was scored at
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .calibration import calibrator_of, raw_purchase_proba
+from .config import ADDON_META, PRICE_BUCKETS, Policy
+from .features import NUMERIC, SEGMENT_KEY, price_design_grid
+from .optimizer import AddonOffer, best_feasible_offers, same_list_prices
+
+
+@dataclass
+class SegmentFallbackTable:
+    TIER = "segment_table"
+
+    segment_index: Dict[Tuple[str, ...], int]
+    addon_index: Dict[str, int]
+    price_grid: List[float]
+    probs: np.ndarray  # raw probabilities, shape (n_segments, n_addons, n_prices)
+    calibrator: Optional[Any] = None
+    list_price_map: Optional[Dict[str, float]] = None  # list prices the table was scored at
+
+    def _segment_probs(self, context: Mapping) -> np.ndarray:
+        key = tuple(str(context[c]) for c in SEGMENT_KEY)
+        idx = self.segment_index.get(key)
+        if idx is None:
+            # Unseen segment: average over all known segments
+            return self.probs.mean(axis=0)
+        return self.probs[idx]
+
+    def lookup(
+        self,
+        context: Mapping,
+        policy: Policy,
+        addon_costs: Dict[str, float],
+        addon_candidates: List[str],
+        top_k: int = 2,
+        list_price_map: Dict[str, float] | None = None,
+        price_grid: List[float] | None = None,
+    ) -> List[AddonOffer]:
+        """
+        Best feasible precomputed price per add-on, ranked by probability.
+        `price_grid` (the request's buckets) limits offers to prices the caller asked for;
+        `list_price_map` must match the list prices the table was scored at.
+        """
+        if not list_price_map:
+            raise ValueError("list_price_map is required and cannot be empty")
+        if not same_list_prices(self.list_price_map, list_price_map, addon_candidates):
+            raise ValueError(
+                f"Table was scored at list prices {self.list_price_map}; "
+                "it cannot answer for other list prices"
+            )
+
+        return best_feasible_offers(
+            self._segment_probs(context),
+            self.addon_index,
+            self.price_grid,
+            policy,
+            addon_costs,
+            addon_candidates,
+            top_k,
+            list_price_map,
+            allowed_prices=price_grid,
+            calibrator=self.calibrator,
+        )
+
+
+def build_segment_fallback_table(
+    df: pd.DataFrame,
+    price_model,
+    price_grid: List[float] | None = None,
+) -> SegmentFallbackTable:
+    """Score every (segment, add-on, price) combination with M2 in one batched call."""
+    grid = [float(p) for p in (price_grid or PRICE_BUCKETS)]
+    addons = list(ADDON_META.keys())
+
+    # One representative context per segment seen in training
+    seg_ctx = df.groupby(SEGMENT_KEY, observed=True)[NUMERIC].median().reset_index()
+    n_seg, n_addon, n_price = len(seg_ctx), len(addons), len(grid)
+
+    list_prices = {a: float(ADDON_META[a]["base_price"]) for a in addons}
+    X = price_design_grid(seg_ctx, addons, grid, list_prices)
+    probs = raw_purchase_proba(price_model, X)
+
+    segment_index = {
+        tuple(str(v) for v in key): i
+        for i, key in enumerate(seg_ctx[SEGMENT_KEY].itertuples(index=False, name=None))
+    }
+    return SegmentFallbackTable(
+        segment_index=segment_index,
+        addon_index={a: i for i, a in enumerate(addons)},
+        price_grid=grid,
+        probs=probs.reshape(n_seg, n_addon, n_price),
+        calibrator=calibrator_of(price_model),
+        list_price_map=list_prices,
+    )
@@ -1,7 +1,6 @@
-from typing import List
+from typing import Dict, List
+import numpy as np
 import pandas as pd
-from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
 
 # --- Column definitions (NO DUPLICATES) ---
 CAT_BASE: List[str] = ["route_od", "payment_type", "loyalty_tier", "season"]
@@ -22,23 +21,94 @@ PRICE_NUMERIC: List[str] = NUMERIC + [
     "price_offered", "price_list", "discount_pct", "price_x_days", "price_x_pax"
 ]
 
+# Segment key for the per-segment fallback offer table
+SEGMENT_KEY: List[str] = ["route_od", "loyalty_tier", "payment_type", "season"]
+
 TARGET = "label_purchase"
 GROUP_KEY = "booking_id"
 
+# --- Typed training frames ---
+# Compact dtypes for the training schema: categoricals for strings, float32 numerics,
+# integer booking keys and an int8 label.
+FLOAT32_COLS: List[str] = [
+    "flight_duration_min", "price_offered", "price_list", "discount_pct",
+    "price_x_days", "price_x_pax",
+]
+INT_COLS: Dict[str, str] = {
+    "dep_hour_local": "int8",
+    "pax_count": "int8",
+    "days_to_departure": "int16",
+    "purchased_any_addon": "int8",
+    "used_upgrade": "int8",
+    TARGET: "int8",
+}
+
+def to_training_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a training frame to the compact schema, column by column and in place
+    (the same frame is returned). String booking ids like "B100123" become integers.
+    """
+    if GROUP_KEY in df and not pd.api.types.is_integer_dtype(df[GROUP_KEY]):
+        keys = df[GROUP_KEY].astype(str).str.lstrip("B")
+        df[GROUP_KEY] = pd.to_numeric(keys, errors="coerce")
+        if df[GROUP_KEY].isna().any():
+            # Non-numeric ids: fall back to dense codes
+            df[GROUP_KEY] = pd.factorize(keys)[0]
+        df[GROUP_KEY] = df[GROUP_KEY].astype("int64")
+    for c in CATEGORICAL:
+        if c in df and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+    for c in FLOAT32_COLS:
+        if c in df:
+            df[c] = df[c].astype("float32")
+    for c, dtype in INT_COLS.items():
+        if c in df:
+            df[c] = df[c].astype(dtype)
+    return df
+
+def add_price_interactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Add price_x_days / price_x_pax to `df` in place, keeping the price column's float dtype."""
+    price = df["price_offered"]
+    df["price_x_days"] = price * df["days_to_departure"].astype(price.dtype)
+    df["price_x_pax"] = price * df["pax_count"].astype(price.dtype)
+    return df
+
 # --- Preprocessors ---
-preprocessor_propensity = ColumnTransformer(
-    transformers=[
-        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL),
-        ("num", StandardScaler(), NUMERIC),
-    ]
-)
-
-preprocessor_price = ColumnTransformer(
-    transformers=[
-        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL),
-        ("num", StandardScaler(), PRICE_NUMERIC),
-    ]
-)
+# Built on demand so serving workers that only score a saved artifact never import sklearn here.
+def make_preprocessor_propensity():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    return ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore", dtype=np.float32), CATEGORICAL),
+            ("num", StandardScaler(), NUMERIC),
+        ]
+    )
+
+def make_preprocessor_price():
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    return ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore", dtype=np.float32), CATEGORICAL),
+            ("num", StandardScaler(), PRICE_NUMERIC),
+        ]
+    )
+
+_PREPROCESSOR_FACTORIES = {
+    "preprocessor_propensity": make_preprocessor_propensity,
+    "preprocessor_price": make_preprocessor_price,
+}
+
+def __getattr__(name: str):
+    # Backwards-compatible module attributes, created on first access (PEP 562)
+    if name in _PREPROCESSOR_FACTORIES:
+        value = _PREPROCESSOR_FACTORIES[name]()
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- Guard ---
 def assert_unique_columns(df: pd.DataFrame, cols: List[str]) -> None:
@@ -46,3 +116,24 @@ def assert_unique_columns(df: pd.DataFrame, cols: List[str]) -> None:
     if not idx.is_unique:
         dupes = idx[idx.duplicated()].tolist()
         raise AssertionError(f"Duplicate column selections detected: {dupes}")
+
+# --- M2 design over a price grid ---
+def price_design_grid(
+    contexts: pd.DataFrame,
+    addons: List[str],
+    price_grid: List[float],
+    list_price_map: Dict[str, float],
+) -> pd.DataFrame:
+    """
+    Cross every context row with every (addon, price) pair, in that nesting order, and
+    add the M2 price/interaction columns. Row i*len(addons)*len(price_grid) + a*len(price_grid) + j
+    is context i, addon a, price j.
+    """
+    n_ctx, n_addon, n_price = len(contexts), len(addons), len(price_grid)
+    X = contexts.loc[contexts.index.repeat(n_addon * n_price)].reset_index(drop=True)
+    X["addon_id"] = np.tile(np.repeat(addons, n_price), n_ctx)
+    X["price_offered"] = np.tile(np.asarray(price_grid, dtype=float), n_ctx * n_addon)
+    X["price_list"] = X["addon_id"].map({a: float(list_price_map[a]) for a in addons})
+    X["discount_pct"] = (X["price_list"] - X["price_offered"]) / X["price_list"].clip(lower=1e-6)
+    add_price_interactions(X)
+    return X[CATEGORICAL + PRICE_NUMERIC]
@@ -0,0 +1,343 @@
+"""
+Precomputed offer lookup table (offline job + O(1) serving reads):
+- Axes: route_od x payment_type x loyalty_tier x season x bucketed NUMERIC features x addon_id x price
+- Numeric features are bucketed on training quantiles; each bucket is scored at its median value
+- Stored as a float16 .npy of raw M2 probabilities (memory-mappable) plus a JSON sidecar with
+  vocabularies and bucket edges; the model's calibrator is saved next to it and applied to the
+  chosen prices only
+- Serving computes one index per context and re-applies the policy over the price axis, so the
+  table answers for any policy without being rebuilt; list prices are M2 features, so it only
+  answers requests whose list prices match the ones it was scored at (ADDON_META base prices
+  unless built with other ones)
+- Built from the served MODEL_ARTIFACT, whose model_id is recorded in the sidecar; serving
+  refuses a table whose model_id does not match the loaded models
+Usage:
+    python -m addon_boost.lookup --artifact models.pkl --out offer_table --resolution 4 --report 2,4
+Cost: one M2 scoring pass over every cell. Resolution 4 is ~24 MB and takes minutes on one
+core; each +1 resolution multiplies the cell count (resolution 8 is ~190 MB, well over 15 min).
+"""
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .calibration import ProbabilityCalibrator, calibrator_of, raw_purchase_proba
+from .config import ADDON_META, PRICE_BUCKETS, Policy
+from .features import CAT_BASE, NUMERIC, price_design_grid
+from .optimizer import AddonOffer, best_feasible_offers, same_list_prices
+
+TABLE_FILE = "offer_table.npy"
+CALIBRATION_FILE = "offer_calibration.npy"
+META_FILE = "offer_table.json"
+
+
+@dataclass
+class OfferLookupTable:
+    TIER = "lookup_table"
+
+    cat_vocab: Dict[str, List[str]]        # CAT_BASE column -> categories (axis order)
+    num_edges: Dict[str, List[float]]      # NUMERIC column -> interior bucket edges
+    num_values: Dict[str, List[float]]     # NUMERIC column -> representative value per bucket
+    addons: List[str]
+    price_grid: List[float]
+    list_price_map: Dict[str, float]       # list prices the table was scored at
+    probs: np.ndarray  # shape (*cat dims, *numeric bucket dims, n_addons, n_prices)
+    model_id: Optional[str] = None          # artifact model_id the table was scored with
+    calibrator: Optional[ProbabilityCalibrator] = None
+
+    # value -> axis index maps, built once so a lookup is dict gets + searchsorted only
+    cat_index: Dict[str, Dict[str, int]] = field(init=False, repr=False, compare=False)
+    addon_index: Dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.cat_index = {c: {v: i for i, v in enumerate(vals)} for c, vals in self.cat_vocab.items()}
+        self.addon_index = {a: i for i, a in enumerate(self.addons)}
+
+    def check_model(self, model_id: Optional[str]) -> None:
+        """Raise unless the table was built from the model artifact identified by `model_id`."""
+        if self.model_id is None or self.model_id != model_id:
+            raise ValueError(
+                f"Offer table was built for model_id={self.model_id!r}, "
+                f"but the served models are model_id={model_id!r}"
+            )
+
+    def _index(self, context: Mapping) -> Tuple[List, List[int]]:
+        """Axis indices for one context; unknown categories become a full slice."""
+        idx: List = []
+        unknown_axes: List[int] = []
+        for axis, c in enumerate(CAT_BASE):
+            i = self.cat_index[c].get(str(context[c]))
+            if i is None:
+                idx.append(slice(None))
+                unknown_axes.append(axis)
+            else:
+                idx.append(i)
+        for c in NUMERIC:
+            idx.append(int(np.searchsorted(self.num_edges[c], float(context[c]), side="right")))
+        return idx, unknown_axes
+
+    def cell(self, context: Mapping) -> np.ndarray:
+        """(n_addons, n_prices) purchase probabilities for one context."""
+        idx, unknown_axes = self._index(context)
+        block = np.asarray(self.probs[tuple(idx)], dtype=np.float32)
+        if unknown_axes:
+            # Sliced axes keep their relative order at the front of the block
+            block = block.mean(axis=tuple(range(len(unknown_axes))))
+        return block
+
+    def lookup(
+        self,
+        context: Mapping,
+        policy: Policy,
+        addon_costs: Dict[str, float],
+        addon_candidates: List[str],
+        top_k: int = 2,
+        list_price_map: Dict[str, float] | None = None,
+        price_grid: List[float] | None = None,
+    ) -> List[AddonOffer]:
+        """
+        Best feasible precomputed price per add-on, ranked by probability.
+        `price_grid` (the request's buckets) limits offers to prices the caller asked for;
+        `list_price_map` must match the list prices the table was scored at.
+        """
+        if not list_price_map:
+            raise ValueError("list_price_map is required and cannot be empty")
+        if not same_list_prices(self.list_price_map, list_price_map, addon_candidates):
+            raise ValueError(
+                f"Table was scored at list prices {self.list_price_map}; "
+                "it cannot answer for other list prices"
+            )
+
+        return best_feasible_offers(
+            self.cell(context),
+            self.addon_index,
+            self.price_grid,
+            policy,
+            addon_costs,
+            addon_candidates,
+            top_k,
+            list_price_map,
+            allowed_prices=price_grid,
+            calibrator=self.calibrator,
+        )
+
+    # --- Persistence ---
+    def save(self, out_dir: str) -> None:
+        os.makedirs(out_dir, exist_ok=True)
+        np.save(os.path.join(out_dir, TABLE_FILE), np.ascontiguousarray(self.probs))
+        meta = {
+            "cat_vocab": self.cat_vocab,
+            "num_edges": self.num_edges,
+            "num_values": self.num_values,
+            "addons": self.addons,
+            "price_grid": self.price_grid,
+            "list_price_map": self.list_price_map,
+            "model_id": self.model_id,
+            "shape": list(self.probs.shape),
+            "calibration": None,
+        }
+        if self.calibrator is not None:
+            np.save(os.path.join(out_dir, CALIBRATION_FILE), self.calibrator.table)
+            meta["calibration"] = {
+                "method": self.calibrator.method,
+                "addon_index": self.calibrator.addon_index,
+            }
+        with open(os.path.join(out_dir, META_FILE), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, table_dir: str, mmap: bool = True) -> "OfferLookupTable":
+        with open(os.path.join(table_dir, META_FILE)) as f:
+            meta = json.load(f)
+        probs = np.load(os.path.join(table_dir, TABLE_FILE), mmap_mode="r" if mmap else None)
+        if list(probs.shape) != meta["shape"]:
+            raise ValueError(f"Offer table shape {probs.shape} does not match metadata {meta['shape']}")
+        calibrator = None
+        if meta.get("calibration"):
+            calibrator = ProbabilityCalibrator(
+                method=meta["calibration"]["method"],
+                addon_index=meta["calibration"]["addon_index"],
+                table=np.load(os.path.join(table_dir, CALIBRATION_FILE)),
+            )
+        return cls(
+            cat_vocab=meta["cat_vocab"],
+            num_edges=meta["num_edges"],
+            num_values=meta["num_values"],
+            addons=meta["addons"],
+            price_grid=meta["price_grid"],
+            list_price_map=meta["list_price_map"],
+            probs=probs,
+            model_id=meta.get("model_id"),
+            calibrator=calibrator,
+        )
+
+
+# --- Offline build ---
+def _numeric_buckets(values: np.ndarray, resolution: int) -> Tuple[List[float], List[float]]:
+    """(interior edges, representative value per bucket) for one numeric column."""
+    uniq = np.unique(values)
+    if len(uniq) <= resolution:
+        # Few distinct values (pax_count, flags): one bucket per value, exact
+        return ((uniq[:-1] + uniq[1:]) / 2).tolist(), uniq.tolist()
+
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, resolution + 1)[1:-1]))
+    bucket = np.searchsorted(edges, values, side="right")
+    reps: List[float] = []
+    for b in range(len(edges) + 1):
+        in_bucket = values[bucket == b]
+        if len(in_bucket):
+            reps.append(float(np.median(in_bucket)))
+        else:
+            reps.append(float(edges[min(b, len(edges) - 1)]))
+    return edges.tolist(), reps
+
+
+def build_offer_lookup_table(
+    df: pd.DataFrame,
+    price_model,
+    resolution: int = 4,
+    price_grid: List[float] | None = None,
+    list_price_map: Dict[str, float] | None = None,
+    model_id: str | None = None,
+) -> OfferLookupTable:
+    """Score the full bucketed grid with M2, one batched predict call per categorical cell."""
+    grid = [float(p) for p in (price_grid or PRICE_BUCKETS)]
+    addons = list(ADDON_META.keys())
+    list_prices = {a: float((list_price_map or {}).get(a, ADDON_META[a]["base_price"])) for a in addons}
+
+    cat_vocab = {c: sorted(map(str, df[c].unique())) for c in CAT_BASE}
+    num_edges: Dict[str, List[float]] = {}
+    num_values: Dict[str, List[float]] = {}
+    for c in NUMERIC:
+        num_edges[c], num_values[c] = _numeric_buckets(df[c].to_numpy(dtype=float), resolution)
+
+    # Every combination of numeric bucket representatives, shared by all categorical cells
+    num_grid = pd.DataFrame(
+        list(itertools.product(*(num_values[c] for c in NUMERIC))), columns=NUMERIC
+    )
+    cat_shape = [len(cat_vocab[c]) for c in CAT_BASE]
+    num_shape = [len(num_values[c]) for c in NUMERIC]
+    probs = np.empty(cat_shape + num_shape + [len(addons), len(grid)], dtype=np.float16)
+
+    for cat_idx in itertools.product(*(range(n) for n in cat_shape)):
+        contexts = num_grid.assign(
+            **{c: cat_vocab[c][i] for c, i in zip(CAT_BASE, cat_idx)}
+        )
+        X = price_design_grid(contexts, addons, grid, list_prices)
+        p = raw_purchase_proba(price_model, X)
+        probs[cat_idx] = p.reshape(num_shape + [len(addons), len(grid)])
+
+    return OfferLookupTable(
+        cat_vocab=cat_vocab,
+        num_edges=num_edges,
+        num_values=num_values,
+        addons=addons,
+        price_grid=grid,
+        list_price_map=list_prices,
+        probs=probs,
+        model_id=model_id,
+        calibrator=calibrator_of(price_model),
+    )
+
+
+# --- Accuracy vs live scoring ---
+def lookup_accuracy_report(
+    df: pd.DataFrame,
+    price_model,
+    resolutions: Sequence[int] = (2, 4),
+    n_eval: int = 500,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Compare table probabilities against live M2 scoring on sampled training contexts
+    (both raw, i.e. before calibration).
+    One row per resolution: prob error, best-price / top-1 add-on agreement, size and build time.
+    The `*_req_list` columns score live at list prices drawn like real requests (base price
+    +/- 20%, as in data_gen): the error the table would add if it ignored request list prices.
+    """
+    ctx = (
+        df.drop_duplicates("booking_id")[CAT_BASE + NUMERIC]
+        .sample(n=min(n_eval, df["booking_id"].nunique()), random_state=seed)
+        .reset_index(drop=True)
+    )
+    addons = list(ADDON_META.keys())
+    grid = [float(p) for p in PRICE_BUCKETS]
+    list_prices = {a: float(ADDON_META[a]["base_price"]) for a in addons}
+    X = price_design_grid(ctx, addons, grid, list_prices)
+    live = raw_purchase_proba(price_model, X).reshape(len(ctx), len(addons), len(grid))
+
+    # Same contexts at per-request list prices
+    rng = np.random.default_rng(seed)
+    base = np.array([list_prices[a] for a in addons])
+    req_list = base * (1.0 + 0.2 * rng.normal(size=(len(ctx), len(addons))))
+    X["price_list"] = np.repeat(req_list.ravel(), len(grid)).astype(X["price_list"].dtype)
+    X["discount_pct"] = (X["price_list"] - X["price_offered"]) / X["price_list"].clip(lower=1e-6)
+    live_req = raw_purchase_proba(price_model, X).reshape(len(ctx), len(addons), len(grid))
+
+    rows = []
+    for res in resolutions:
+        t0 = time.perf_counter()
+        table = build_offer_lookup_table(df, price_model, resolution=res, price_grid=grid)
+        build_s = time.perf_counter() - t0
+        approx = np.stack([table.cell(r) for r in ctx.to_dict("records")])
+
+        err = np.abs(approx - live)
+        err_req = np.abs(approx - live_req)
+        rows.append({
+            "resolution": res,
+            "cells": int(np.prod(table.probs.shape[:-2])),
+            "table_mb": table.probs.nbytes / 1e6,
+            "build_s": build_s,
+            "mean_abs_err": float(err.mean()),
+            "p95_abs_err": float(np.quantile(err, 0.95)),
+            "max_abs_err": float(err.max()),
+            "best_price_match": float((approx.argmax(-1) == live.argmax(-1)).mean()),
+            "top1_addon_match": float((approx.max(-1).argmax(-1) == live.max(-1).argmax(-1)).mean()),
+            "mean_abs_err_req_list": float(err_req.mean()),
+            "p95_abs_err_req_list": float(np.quantile(err_req, 0.95)),
+            "best_price_match_req_list": float((approx.argmax(-1) == live_req.argmax(-1)).mean()),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .data_gen import generate_synthetic_training
+
+    parser = argparse.ArgumentParser(description="Build the precomputed offer lookup table")
+    parser.add_argument("--artifact", default=os.getenv("MODEL_ARTIFACT"),
+                        help="model artifact to score with (the one serving loads)")
+    parser.add_argument("--out", default="offer_table")
+    parser.add_argument("--n-bookings", type=int, default=3000,
+                        help="synthetic bookings used for vocabularies and bucket edges")
+    parser.add_argument("--resolution", type=int, default=4)
+    parser.add_argument("--report", default="", help="comma-separated resolutions to evaluate")
+    args = parser.parse_args()
+
+    df = generate_synthetic_training(n_bookings=args.n_bookings, typed=True)
+    if args.artifact:
+        from .artifact import load_models
+
+        bundle = load_models(args.artifact)
+        price_model, model_id = bundle["price_model"], bundle.get("model_id")
+    else:
+        from .models import train_price_elasticity_model
+
+        print("[lookup] No --artifact/MODEL_ARTIFACT: scoring with a throwaway M2; "
+              "serving will refuse this table")
+        price_model, model_id = train_price_elasticity_model(df), None
+
+    table = build_offer_lookup_table(df, price_model, resolution=args.resolution, model_id=model_id)
+    table.save(args.out)
+    print(f"[lookup] Wrote {table.probs.shape} table ({table.probs.nbytes / 1e6:.1f} MB, "
+          f"model_id={model_id}) to {args.out}")
+
+    if args.report:
+        resolutions = [int(r) for r in args.report.split(",")]
+        print(lookup_accuracy_report(df, price_model, resolutions=resolutions).to_string(index=False))
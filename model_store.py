@@ -0,0 +1,76 @@
+"""
+Concurrency-safe model access for serving:
+- ModelHolder publishes an immutable ModelSnapshot (M1, M2, fallback table) by a single
+  reference assignment; each request reads the reference once and uses that snapshot
+- Loading is single-flight: concurrent first callers wait on one load instead of each training
+- reload() builds the replacement off to the side and swaps it in; in-flight requests keep
+  the snapshot they started with. Reloads are single-flight too: callers that arrive while
+  one is running get its snapshot instead of queueing another load
+"""
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    propensity_model: Any
+    price_model: Any
+    fallback_table: Any
+    version: int
+
+
+def set_predict_threads(model, n_threads: int) -> None:
+    """Pin XGBoost prediction threads on a trained pipeline (before it is published)."""
+    clf = model.named_steps["clf"] if hasattr(model, "named_steps") else model
+    clf.set_params(n_jobs=n_threads)
+    clf.get_booster().set_param({"nthread": n_threads})
+
+
+def predict_threads_for(serve_threads: int) -> int:
+    """Per-request XGBoost threads so `serve_threads` concurrent requests fill, not oversubscribe, the cores."""
+    return max(1, (os.cpu_count() or 1) // max(1, serve_threads))
+
+
+class ModelHolder:
+    def __init__(
+        self,
+        loader: Callable[[], Tuple[Any, Any, Any]],
+        predict_threads: Optional[int] = None,
+    ):
+        self._loader = loader
+        self._predict_threads = predict_threads
+        self._snapshot: Optional[ModelSnapshot] = None
+        self._load_lock = threading.Lock()
+        self.load_count = 0
+
+    def _load(self) -> ModelSnapshot:
+        prop, price, table = self._loader()
+        if self._predict_threads is not None:
+            set_predict_threads(prop, self._predict_threads)
+            set_predict_threads(price, self._predict_threads)
+        self.load_count += 1
+        return ModelSnapshot(prop, price, table, version=self.load_count)
+
+    def get(self) -> ModelSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        with self._load_lock:
+            # Whoever got the lock first loaded it; everyone else just reads the result
+            if self._snapshot is None:
+                self._snapshot = self._load()
+            return self._snapshot
+
+    def reload(self) -> ModelSnapshot:
+        seen = self.load_count
+        with self._load_lock:
+            # A reload that finished while we waited already picked up fresh models
+            if self.load_count == seen:
+                self._snapshot = self._load()
+            return self._snapshot
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
@@ -3,108 +3,171 @@ Model training:
 - M1: Propensity / ranking classifier (predicts P(purchase | context, addon))
 - M2: Price / elasticity classifier (predicts P(purchase | price, context, addon))
 Notes:
-- Interaction features (price_x_days, price_x_pax) are CREATED BEFORE column selection
-  to avoid KeyError during preprocessing.
+- Interaction features (price_x_days, price_x_pax) are added in place on the selected
+  design frame, so the full training frame is never copied.
+- Works on legacy object frames and on typed frames from `features.to_training_frame`.
 - GroupKFold on booking_id prevents leakage across the same booking.
+- The preprocessor is fit once and the design matrix is encoded once (float32); folds slice
+  that compact matrix instead of re-copying and re-encoding the frame. Scaling / one-hot
+  vocabularies are unsupervised, so fitting them on all rows does not leak labels.
+- encoding="onehot" (default) one-hot encodes CATEGORICAL; encoding="native" feeds them to
+  XGBoost as pandas categoricals with a vocabulary persisted in the pipeline (scales to
+  large route / add-on vocabularies without widening the matrix).
+- calibration="isotonic"|"platt" fits a per-add-on calibrator on the out-of-fold predictions
+  and attaches it to the selected pipeline as `calibrator_`. The optimizer chooses prices on
+  the raw score and calibrates only the chosen rows.
 """
 import numpy as np
 import pandas as pd
 from xgboost import XGBClassifier
 from sklearn.model_selection import GroupKFold
-from sklearn.metrics import roc_auc_score, average_precision_score
+from sklearn.metrics import roc_auc_score, average_precision_score, brier_score_loss
 from sklearn.pipeline import Pipeline
 
+from .calibration import fit_calibrator
+from .categorical import NativeCategoricalEncoder
 from .features import (
     CAT_BASE, ITEM_COL, NUMERIC, CATEGORICAL, PRICE_NUMERIC,
     TARGET, GROUP_KEY,
-    preprocessor_propensity, preprocessor_price,
-    assert_unique_columns,
+    make_preprocessor_propensity, make_preprocessor_price,
+    add_price_interactions, assert_unique_columns,
 )
 
+ENCODINGS = ("onehot", "native")
+
+def _make_prep(encoding: str, numeric_cols, onehot_factory):
+    if encoding == "onehot":
+        return onehot_factory()
+    return NativeCategoricalEncoder(CATEGORICAL, numeric_cols)
+
+def _encoding_params(encoding: str) -> dict:
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown encoding {encoding!r}; expected one of {ENCODINGS}")
+    if encoding == "native":
+        # Partition-based categorical splits need the hist tree method
+        return {"tree_method": "hist", "enable_categorical": True, "max_cat_to_onehot": 1}
+    return {}
+
+def _encode_once(prep, X: pd.DataFrame):
+    M = prep.fit_transform(X)
+    if isinstance(M, pd.DataFrame):
+        return M
+    # Legacy float64 frames would otherwise give a float64 matrix from StandardScaler
+    return M.astype(np.float32, copy=False)
+
+def _take_rows(M, idx: np.ndarray):
+    return M.iloc[idx] if isinstance(M, pd.DataFrame) else M[idx]
+
+def _attach_calibrator(pipe: Pipeline, oof: np.ndarray, y: np.ndarray, addon_ids, method: str | None, tag: str) -> None:
+    if method is None:
+        return
+    calibrator = fit_calibrator(oof, y, addon_ids, method=method)
+    calibrated = calibrator.transform(oof, addon_ids)
+    print(f"[{tag}] Calibration ({method}) OOF Brier {brier_score_loss(y, oof):.4f} -> "
+          f"{brier_score_loss(y, calibrated):.4f}")
+    pipe.calibrator_ = calibrator
+
 # --- M1: Propensity (context + addon) ---
-def train_propensity_model(df: pd.DataFrame) -> Pipeline:
+def train_propensity_model(
+    df: pd.DataFrame, encoding: str = "onehot", calibration: str | None = None
+) -> Pipeline:
     assert TARGET in df, "Missing target column"
+    clf_params = _encoding_params(encoding)
     X_cols = CAT_BASE + ITEM_COL + NUMERIC
     assert_unique_columns(df, X_cols)
 
-    X = df[X_cols].copy()
-    y = df[TARGET].astype(int).values
+    X = df[X_cols]
+    y = df[TARGET].to_numpy(dtype=np.int8)
 
     gkf = GroupKFold(n_splits=5)
     groups = df[GROUP_KEY]
 
     best_auc = -np.inf
     best_pipe: Pipeline | None = None
+    oof = np.empty(len(y), dtype=np.float64)
+
+    prep = _make_prep(encoding, NUMERIC, make_preprocessor_propensity)
+    M = _encode_once(prep, X)
 
     for fold, (tr, va) in enumerate(gkf.split(X, y, groups=groups)):
-        pipe = Pipeline([
-            ("prep", preprocessor_propensity),
-            ("clf", XGBClassifier(
-                n_estimators=400,
-                max_depth=6,
-                learning_rate=0.05,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                reg_lambda=1.0,
-                eval_metric="logloss",
-                n_jobs=-1,
-            )),
-        ])
-        pipe.fit(X.iloc[tr], y[tr])
-        proba = pipe.predict_proba(X.iloc[va])[:, 1]
+        clf = XGBClassifier(
+            n_estimators=400,
+            max_depth=6,
+            learning_rate=0.05,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            reg_lambda=1.0,
+            eval_metric="logloss",
+            n_jobs=-1,
+            **clf_params,
+        )
+        M_tr = _take_rows(M, tr)
+        clf.fit(M_tr, y[tr])
+        del M_tr  # free before the next fold's slice is taken
+        proba = clf.predict_proba(_take_rows(M, va))[:, 1]
+        oof[va] = proba
         auc = roc_auc_score(y[va], proba)
         ap = average_precision_score(y[va], proba)
         print(f"[M1][Fold {fold}] AUC={auc:.4f} AP={ap:.4f}")
         if auc > best_auc:
             best_auc = auc
-            best_pipe = pipe
+            # prep is already fitted; the pipeline only chains it with the selected booster
+            best_pipe = Pipeline([("prep", prep), ("clf", clf)])
 
     print(f"[M1] Selected model AUC={best_auc:.4f}")
     assert best_pipe is not None
+    _attach_calibrator(best_pipe, oof, y, X["addon_id"], calibration, "M1")
     return best_pipe
 
 # --- M2: Price / Elasticity (context + addon + price/interactions) ---
-def train_price_elasticity_model(df: pd.DataFrame) -> Pipeline:
-    # Create interactions BEFORE selecting columns to avoid KeyError
-    df_local = df.copy()
-    df_local["price_x_days"] = df_local["price_offered"] * df_local["days_to_departure"].astype(float)
-    df_local["price_x_pax"]  = df_local["price_offered"] * df_local["pax_count"].astype(float)
-
+def train_price_elasticity_model(
+    df: pd.DataFrame, encoding: str = "onehot", calibration: str | None = None
+) -> Pipeline:
+    clf_params = _encoding_params(encoding)
     X_cols = CATEGORICAL + PRICE_NUMERIC
-    assert_unique_columns(df_local, X_cols)
+    assert_unique_columns(df, X_cols)
 
-    X = df_local[X_cols].copy()
-    y = df_local[TARGET].astype(int).values
+    # Select once (interaction columns come in empty), then fill interactions in place
+    X = df.reindex(columns=X_cols)
+    add_price_interactions(X)
+    y = df[TARGET].to_numpy(dtype=np.int8)
 
     gkf = GroupKFold(n_splits=5)
-    groups = df_local[GROUP_KEY]
+    groups = df[GROUP_KEY]
 
     best_auc = -np.inf
     best_pipe: Pipeline | None = None
+    oof = np.empty(len(y), dtype=np.float64)
+
+    prep = _make_prep(encoding, PRICE_NUMERIC, make_preprocessor_price)
+    M = _encode_once(prep, X)
 
     for fold, (tr, va) in enumerate(gkf.split(X, y, groups=groups)):
-        pipe = Pipeline([
-            ("prep", preprocessor_price),
-            ("clf", XGBClassifier(
-                n_estimators=500,
-                max_depth=6,
-                learning_rate=0.05,
-                subsample=0.8,
-                colsample_bytree=0.8,
-                reg_lambda=1.0,
-                eval_metric="logloss",
-                n_jobs=-1,
-            )),
-        ])
-        pipe.fit(X.iloc[tr], y[tr])
-        proba = pipe.predict_proba(X.iloc[va])[:, 1]
+        clf = XGBClassifier(
+            n_estimators=500,
+            max_depth=6,
+            learning_rate=0.05,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            reg_lambda=1.0,
+            eval_metric="logloss",
+            n_jobs=-1,
+            **clf_params,
+        )
+        M_tr = _take_rows(M, tr)
+        clf.fit(M_tr, y[tr])
+        del M_tr  # free before the next fold's slice is taken
+        proba = clf.predict_proba(_take_rows(M, va))[:, 1]
+        oof[va] = proba
         auc = roc_auc_score(y[va], proba)
         ap = average_precision_score(y[va], proba)
         print(f"[M2][Fold {fold}] AUC={auc:.4f} AP={ap:.4f}")
         if auc > best_auc:
             best_auc = auc
-            best_pipe = pipe
+            # prep is already fitted; the pipeline only chains it with the selected booster
+            best_pipe = Pipeline([("prep", prep), ("clf", clf)])
 
     print(f"[M2] Selected model AUC={best_auc:.4f}")
     assert best_pipe is not None
+    _attach_calibrator(best_pipe, oof, y, X["addon_id"], calibration, "M2")
     return best_pipe
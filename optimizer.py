@@ -3,15 +3,26 @@ Offer optimization:
 - Enforces policy guardrails:
   • price <= per-add-on list price (from required list_price_map)
   • max discount and min margin
-- One price per add-on: pick the bucket with highest predicted purchase probability
+- One price per add-on: pick the bucket with highest raw predicted purchase probability
 - Rank add-ons by probability and return top_k
+- When training attached a per-add-on calibrator, only the chosen rows are calibrated:
+  it changes reported probabilities and cross-add-on ranking, never the price choice
+- Latency budget: step down full grid -> coarse grid -> M1-only -> precomputed table
+  when the predicted scoring cost would exceed the per-request budget
 """
+import threading
+import time
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Tuple
+import numpy as np
 import pandas as pd
 
+from .calibration import calibrate, calibrator_of, raw_purchase_proba
 from .features import CAT_BASE, ITEM_COL, NUMERIC, CATEGORICAL, PRICE_NUMERIC
-from .config import Policy
+from .config import Policy, DEFAULT_SCORE_CALL_MS, COARSE_GRID_SIZE
+
+# Serving tiers, most accurate first
+SERVING_TIERS = ("full", "coarse_grid", "m1_only", "lookup_table", "segment_table")
 
 
 @dataclass
@@ -45,10 +56,12 @@ def optimize_offers(
     addon_candidates: List[str],
     top_k: int = 2,
     list_price_map: Dict[str, float] | None = None,
+    addon_price_grids: Dict[str, List[float]] | None = None,
 ) -> List[AddonOffer]:
     """
     One price per add-on (max probability), then rank add-ons by probability.
     `list_price_map` is REQUIRED and must contain entries for all candidate add-ons.
+    `addon_price_grids` (add-on -> prices) replaces `price_grid` for the add-ons it lists.
     """
     if not list_price_map:
         raise ValueError("list_price_map is required and cannot be empty")
@@ -57,7 +70,8 @@ def optimize_offers(
     if missing:
         raise ValueError(f"list_price_map missing add-ons: {missing}")
 
-    per_addon_best: Dict[str, AddonOffer] = {}
+    # (addon, price, raw prob, cost) of the chosen price per add-on
+    chosen: List[Tuple[str, float, float, float]] = []
 
     for addon in addon_candidates:
         row = context_rows.copy()
@@ -65,9 +79,10 @@ def optimize_offers(
 
         list_price = float(list_price_map[addon])
         cost = addon_costs.get(addon, 0.0)
-        best_offer: AddonOffer | None = None
+        best: Tuple[str, float, float, float] | None = None
 
-        for p in price_grid:
+        grid = price_grid if addon_price_grids is None else addon_price_grids.get(addon, price_grid)
+        for p in grid:
             if not feasible(policy, list_price=list_price, offer_price=p, cost=cost):
                 continue
 
@@ -91,20 +106,326 @@ def optimize_offers(
             )
             X2 = X2[(CATEGORICAL + PRICE_NUMERIC)]
 
-            prob = float(price_model.predict_proba(X2)[:, 1][0])
-            offer = AddonOffer(
-                addon_id=addon,
-                price=p,
-                predicted_prob=prob,
-                expected_profit=prob * (p - cost),
-            )
+            # Choose the price on the raw score: calibration is monotone but stepwise and
+            # would turn neighbouring prices into ties
+            raw = float(raw_purchase_proba(price_model, X2)[0])
+            if (best is None) or (raw > best[2]):
+                best = (addon, p, raw, cost)
+
+        if best is not None:
+            chosen.append(best)
+
+    return rank_offers(chosen, calibrator_of(price_model), top_k)
+
+
+def rank_offers(
+    chosen: List[Tuple[str, float, float, float]],
+    calibrator,
+    top_k: int,
+) -> List[AddonOffer]:
+    """
+    Build offers from (addon, price, raw prob, cost) picks. Only the chosen rows are
+    calibrated (one vectorized call); add-ons rank by calibrated probability, ties
+    broken by the raw score.
+    """
+    if not chosen:
+        return []
+    raw = np.array([c[2] for c in chosen], dtype=np.float64)
+    probs = calibrate(calibrator, raw, [c[0] for c in chosen])
+
+    ranked = sorted(zip(chosen, probs), key=lambda cp: (cp[1], cp[0][2]), reverse=True)
+    return [
+        AddonOffer(
+            addon_id=addon,
+            price=p,
+            predicted_prob=float(prob),
+            expected_profit=float(prob) * (p - cost),
+        )
+        for (addon, p, _, cost), prob in ranked[:top_k]
+    ]
+
+
+def _price_key(p: float) -> float:
+    # Prices arrive as JSON numbers or config floats; compare at cent precision
+    return round(float(p), 2)
+
+
+def shared_prices(table_grid: List[float], request_grid: List[float]) -> List[float]:
+    """Prices of a precomputed table's grid that are also in the request's grid."""
+    requested = {_price_key(p) for p in request_grid}
+    return [p for p in table_grid if _price_key(p) in requested]
+
+
+def same_list_prices(
+    table_list_prices: Dict[str, float] | None,
+    request_list_prices: Dict[str, float],
+    addons: List[str],
+) -> bool:
+    """
+    True when a precomputed table was scored at the request's list prices for `addons`.
+    M2 takes the list price (and the discount off it) as features, so a table scored at
+    other list prices would answer for a different request.
+    """
+    if not table_list_prices:
+        return False
+    return all(
+        a in table_list_prices
+        and _price_key(table_list_prices[a]) == _price_key(request_list_prices[a])
+        for a in addons
+    )
+
+
+def best_feasible_offers(
+    grid_probs,
+    addon_index: Dict[str, int],
+    price_grid: List[float],
+    policy: Policy,
+    addon_costs: Dict[str, float],
+    addon_candidates: List[str],
+    top_k: int,
+    list_price_map: Dict[str, float],
+    allowed_prices: List[float] | None = None,
+    calibrator=None,
+) -> List[AddonOffer]:
+    """
+    Same selection as `optimize_offers`, over precomputed probabilities.
+    `grid_probs[addon_index[a], j]` is the RAW P(purchase) for add-on `a` at `price_grid[j]`;
+    `calibrator` is applied to the chosen rows only.
+    `allowed_prices` (the request's buckets) restricts which grid prices may be offered.
+    """
+    allowed = None if allowed_prices is None else {_price_key(p) for p in allowed_prices}
+    chosen: List[Tuple[str, float, float, float]] = []
+    for addon in addon_candidates:
+        a = addon_index.get(addon)
+        if a is None:
+            continue
+        list_price = float(list_price_map[addon])
+        cost = addon_costs.get(addon, 0.0)
+        best: Tuple[str, float, float, float] | None = None
+        for j, p in enumerate(price_grid):
+            if allowed is not None and _price_key(p) not in allowed:
+                continue
+            if not feasible(policy, list_price=list_price, offer_price=p, cost=cost):
+                continue
+            raw = float(grid_probs[a, j])
+            if best is None or raw > best[2]:
+                best = (addon, p, raw, cost)
+        if best is not None:
+            chosen.append(best)
+
+    return rank_offers(chosen, calibrator, top_k)
+
+
+# --- Degraded serving under a latency budget ---
+class ScoringCostModel:
+    """EWMA of wall time per model scoring call, used to predict the cost of a tier."""
+
+    def __init__(self, init_ms: float = DEFAULT_SCORE_CALL_MS, alpha: float = 0.2):
+        self._ms_per_call = float(init_ms)
+        self._alpha = alpha
+        self._lock = threading.Lock()
+
+    @property
+    def ms_per_call(self) -> float:
+        return self._ms_per_call
+
+    def observe(self, elapsed_ms: float, n_calls: int) -> None:
+        if n_calls <= 0:
+            return
+        sample = elapsed_ms / n_calls
+        with self._lock:
+            self._ms_per_call += self._alpha * (sample - self._ms_per_call)
+
+    def predict_ms(self, n_calls: int, inflight: int = 1) -> float:
+        # Concurrent requests share the same cores, so scale by the number in flight
+        return self._ms_per_call * n_calls * max(1, inflight)
+
+
+COST_MODEL = ScoringCostModel()
+
+
+def coarsen_grid(price_grid: List[float], n: int = COARSE_GRID_SIZE) -> List[float]:
+    """Keep `n` evenly spaced buckets of the sorted grid (endpoints included)."""
+    grid = sorted(set(price_grid))
+    if len(grid) <= n:
+        return grid
+    if n <= 1:
+        return [grid[-1]]
+    step = (len(grid) - 1) / (n - 1)
+    return [grid[round(i * step)] for i in range(n)]
+
+
+def feasible_price_grids(
+    price_grid: List[float],
+    policy: Policy,
+    addon_costs: Dict[str, float],
+    addon_candidates: List[str],
+    list_price_map: Dict[str, float],
+) -> Dict[str, List[float]]:
+    """Per add-on, the prices of `price_grid` its policy, list price and cost allow."""
+    return {
+        a: [
+            p for p in price_grid
+            if feasible(policy, float(list_price_map[a]), p, addon_costs.get(a, 0.0))
+        ]
+        for a in addon_candidates
+    }
 
-            if (best_offer is None) or (offer.predicted_prob > best_offer.predicted_prob):
-                best_offer = offer
 
-        if best_offer is not None:
-            per_addon_best[addon] = best_offer
+def count_scoring_calls(addon_price_grids: Dict[str, List[float]]) -> int:
+    """Number of M2 predict calls `optimize_offers` makes over these (feasible) grids."""
+    return sum(len(g) for g in addon_price_grids.values())
+
+
+def rank_by_propensity(
+    context_rows: pd.DataFrame,
+    propensity_model,
+    price_grid: List[float],
+    policy: Policy,
+    addon_costs: Dict[str, float],
+    addon_candidates: List[str],
+    top_k: int = 2,
+    list_price_map: Dict[str, float] | None = None,
+) -> List[AddonOffer]:
+    """
+    Cheap tier: rank add-ons with M1 in a single batched call.
+    M1 is price-agnostic, so each add-on is offered at its highest feasible grid price.
+    """
+    if not list_price_map:
+        raise ValueError("list_price_map is required and cannot be empty")
+
+    priced: Dict[str, float] = {}
+    for addon in addon_candidates:
+        list_price = float(list_price_map[addon])
+        cost = addon_costs.get(addon, 0.0)
+        ok = [p for p in price_grid if feasible(policy, list_price=list_price, offer_price=p, cost=cost)]
+        if ok:
+            priced[addon] = max(ok)
+    if not priced:
+        return []
+
+    X1 = context_rows.iloc[[0] * len(priced)].reset_index(drop=True)
+    X1["addon_id"] = list(priced)
+    raw = raw_purchase_proba(propensity_model, X1[CAT_BASE + ITEM_COL + NUMERIC])
+
+    chosen = [
+        (addon, p, float(r), addon_costs.get(addon, 0.0))
+        for (addon, p), r in zip(priced.items(), raw)
+    ]
+    return rank_offers(chosen, calibrator_of(propensity_model), top_k)
+
+
+def answer_from_table(
+    context_rows: pd.DataFrame,
+    fallback_table,
+    price_grid: List[float],
+    policy: Policy,
+    addon_costs: Dict[str, float],
+    addon_candidates: List[str],
+    top_k: int = 2,
+    list_price_map: Dict[str, float] | None = None,
+) -> Tuple[List[AddonOffer], str, List[float]] | None:
+    """
+    Offers from a precomputed table, without any model call, as (offers, tier, prices).
+    None when there is no table, or it shares no prices with `price_grid` or was scored at
+    other list prices: a table may only answer with prices the request asked for.
+    """
+    if not list_price_map:
+        raise ValueError("list_price_map is required and cannot be empty")
+    if fallback_table is None:
+        return None
+    prices = shared_prices(fallback_table.price_grid, price_grid)
+    if not prices or not same_list_prices(fallback_table.list_price_map, list_price_map, addon_candidates):
+        return None
+    offers = fallback_table.lookup(
+        context=context_rows.iloc[0],
+        policy=policy,
+        addon_costs=addon_costs,
+        addon_candidates=addon_candidates,
+        top_k=top_k,
+        list_price_map=list_price_map,
+        price_grid=price_grid,
+    )
+    return offers, fallback_table.TIER, prices
+
+
+def optimize_offers_within_budget(
+    context_rows: pd.DataFrame,
+    propensity_model,
+    price_model,
+    price_grid: List[float],
+    policy: Policy,
+    addon_costs: Dict[str, float],
+    addon_candidates: List[str],
+    top_k: int = 2,
+    list_price_map: Dict[str, float] | None = None,
+    budget_ms: float | None = None,
+    elapsed_ms: float = 0.0,
+    inflight: int = 1,
+    queued: int = 0,
+    fallback_table=None,
+    cost_model: ScoringCostModel = COST_MODEL,
+) -> Tuple[List[AddonOffer], str, List[float]]:
+    """
+    Serve from the most accurate tier whose predicted cost fits in what is left of `budget_ms`.
+    Returns (offers, tier, prices) where tier is one of SERVING_TIERS and prices are the
+    buckets that tier chose from (the coarse tier coarsens each add-on's feasible prices, so
+    every add-on with a feasible full-grid price keeps at least one).
+    `fallback_table` is a SegmentFallbackTable or OfferLookupTable (anything with `.lookup`,
+    `.price_grid`, `.list_price_map` and `.TIER`); it is only used when its grid shares prices
+    with `price_grid` and it was scored at the request's list prices, otherwise M1-only is the
+    last resort.
+    `inflight` requests share this one's cores; `queued` requests wait for it to finish. Both
+    add to the predicted cost, only `inflight` divides the observed one.
+    """
+    if not list_price_map:
+        raise ValueError("list_price_map is required and cannot be empty")
+
+    remaining_ms = float("inf") if budget_ms is None else budget_ms - elapsed_ms
+
+    full_grids = feasible_price_grids(price_grid, policy, addon_costs, addon_candidates, list_price_map)
+    coarse_grids = {a: coarsen_grid(g) for a, g in full_grids.items()}
+    for tier, grids in (("full", full_grids), ("coarse_grid", coarse_grids)):
+        n_calls = count_scoring_calls(grids)
+        if cost_model.predict_ms(n_calls, inflight + queued) <= remaining_ms:
+            t0 = time.perf_counter()
+            offers = optimize_offers(
+                context_rows=context_rows,
+                propensity_model=propensity_model,
+                price_model=price_model,
+                price_grid=price_grid,
+                policy=policy,
+                addon_costs=addon_costs,
+                addon_candidates=addon_candidates,
+                top_k=top_k,
+                list_price_map=list_price_map,
+                addon_price_grids=grids,
+            )
+            cost_model.observe((time.perf_counter() - t0) * 1e3 / max(1, inflight), n_calls)
+            return offers, tier, sorted({p for g in grids.values() for p in g})
+
+    if cost_model.predict_ms(1, inflight + queued) > remaining_ms:
+        answer = answer_from_table(
+            context_rows=context_rows,
+            fallback_table=fallback_table,
+            price_grid=price_grid,
+            policy=policy,
+            addon_costs=addon_costs,
+            addon_candidates=addon_candidates,
+            top_k=top_k,
+            list_price_map=list_price_map,
+        )
+        if answer is not None:
+            return answer
 
-    # Rank by purchase probability (desc)
-    offers = sorted(per_addon_best.values(), key=lambda o: o.predicted_prob, reverse=True)
-    return offers[:top_k]
+    offers = rank_by_propensity(
+        context_rows=context_rows,
+        propensity_model=propensity_model,
+        price_grid=price_grid,
+        policy=policy,
+        addon_costs=addon_costs,
+        addon_candidates=addon_candidates,
+        top_k=top_k,
+        list_price_map=list_price_map,
+    )
+    return offers, "m1_only", sorted(set(price_grid))
@@ -1,36 +1,99 @@
 import os
-from typing import Any, Dict, List
+import threading
+import time
+from typing import Any, Dict, List, Optional
 
 import pandas as pd
 from flask import Flask, jsonify, request
 
-from .config import Policy, PRICE_BUCKETS, ADDON_META
-from .data_gen import generate_synthetic_training
-from .models import train_price_elasticity_model, train_propensity_model
-from .optimizer import optimize_offers
+from .config import Policy, PRICE_BUCKETS, ADDON_META, LATENCY_BUDGET_MS
+from .lookup import OfferLookupTable
+from .model_store import ModelHolder, predict_threads_for
+from .optimizer import answer_from_table, optimize_offers_within_budget
 
 app = Flask(__name__)
 
-# Lazy, in-memory models for demo purposes
-PROP_MODEL = None
-PRICE_MODEL = None
 ADDON_COSTS = {k: v["cost"] for k, v in ADDON_META.items()}
 ADDON_CANDIDATES = list(ADDON_META.keys())
+DEFAULT_BUDGET_MS = float(os.getenv("LATENCY_BUDGET_MS", str(LATENCY_BUDGET_MS)))
+
+# The server is threaded; SERVE_THREADS scoring slots (default 1) bound how many requests
+# score at once, each with cpu_count // SERVE_THREADS XGBoost threads, so XGBoost is never
+# oversubscribed. Waiting for a slot happens inside the request and counts against its budget.
+SERVE_THREADS = max(1, int(os.getenv("SERVE_THREADS", "1")))
+_SCORING_SLOTS = threading.BoundedSemaphore(SERVE_THREADS)
+
+# Requests waiting for a scoring slot (the queue the cost model has to account for)
+_WAITING = 0
+_WAITING_LOCK = threading.Lock()
+
+def _train_models():
+    # Training stack is imported here so scoring-only workers never pay for it
+    from .data_gen import generate_synthetic_training
+    from .fallback import build_segment_fallback_table
+    from .models import train_price_elasticity_model, train_propensity_model
+
+    n = int(os.getenv("TRAIN_N_BOOKINGS", "3000"))
+    df = generate_synthetic_training(n_bookings=n, typed=True)
+    encoding = os.getenv("MODEL_ENCODING", "onehot")
+    calibration = os.getenv("CALIBRATION", "isotonic")
+    calibration = None if calibration == "none" else calibration
+    prop = train_propensity_model(df, encoding=encoding, calibration=calibration)
+    price = train_price_elasticity_model(df, encoding=encoding, calibration=calibration)
+    return prop, price, build_segment_fallback_table(df, price)
+
+def _load_models():
+    artifact_path = os.getenv("MODEL_ARTIFACT")
+    if artifact_path:
+        # Serving-only path: written by `python -m addon_boost.artifact`
+        from .artifact import load_models
+
+        bundle = load_models(artifact_path)
+        prop, price, table = bundle["propensity_model"], bundle["price_model"], bundle["fallback_table"]
+        model_id = bundle.get("model_id")
+    else:
+        prop, price, table = _train_models()
+        model_id = None
+    table_dir = os.getenv("OFFER_TABLE_DIR")
+    if table_dir:
+        # Precomputed offline by `lookup.py`; memory-mapped, not read into RAM
+        lookup_table = OfferLookupTable.load(table_dir)
+        try:
+            lookup_table.check_model(model_id)
+            table = lookup_table
+        except ValueError as e:
+            # A table scored by another model would answer inconsistently with the other tiers
+            print(f"[serve] Ignoring OFFER_TABLE_DIR={table_dir}: {e}")
+    return prop, price, table
+
+# Lazy, in-memory models; single-flight load, one immutable snapshot per request
+MODELS = ModelHolder(_load_models, predict_threads=predict_threads_for(SERVE_THREADS))
 
 def get_models():
-    global PROP_MODEL, PRICE_MODEL
-    if PROP_MODEL is None or PRICE_MODEL is None:
-        n = int(os.getenv("TRAIN_N_BOOKINGS", "3000"))
-        df = generate_synthetic_training(n_bookings=n)
-        PROP_MODEL = train_propensity_model(df)
-        PRICE_MODEL = train_price_elasticity_model(df)
-    return PROP_MODEL, PRICE_MODEL
+    snapshot = MODELS.get()
+    return snapshot.propensity_model, snapshot.price_model
+
+def _acquire_slot(timeout_s: Optional[float]) -> bool:
+    # timeout_s=None waits as long as it takes
+    global _WAITING
+    with _WAITING_LOCK:
+        _WAITING += 1
+    try:
+        return _SCORING_SLOTS.acquire(timeout=None if timeout_s is None else max(0.0, timeout_s))
+    finally:
+        with _WAITING_LOCK:
+            _WAITING -= 1
 
 @app.post("/warmup")
 def warmup():
     get_models()
     return jsonify({"status": "warmed"}), 200
 
+@app.post("/reload")
+def reload_models():
+    snapshot = MODELS.reload()
+    return jsonify({"status": "reloaded", "model_version": snapshot.version}), 200
+
 def _validate_context(ctx: Dict[str, Any]):
     required = [
         "booking_id",
@@ -50,8 +113,23 @@ def _validate_context(ctx: Dict[str, Any]):
         return False, f"Missing fields: {missing}"
     return True, None
 
+def _parse_budget(raw: Any):
+    # null / absent -> server default; otherwise a positive number of milliseconds
+    if raw is None:
+        return DEFAULT_BUDGET_MS, None
+    if isinstance(raw, bool):
+        return None, "latency_budget_ms must be a positive number"
+    try:
+        budget_ms = float(raw)
+    except (TypeError, ValueError):
+        return None, "latency_budget_ms must be a positive number"
+    if not budget_ms > 0:
+        return None, "latency_budget_ms must be a positive number"
+    return budget_ms, None
+
 @app.post("/recommend")
 def recommend():
+    t0 = time.perf_counter()
     try:
         payload = request.get_json(force=True, silent=False) or {}
         ctx = payload.get("context", {})
@@ -78,6 +156,9 @@ def recommend():
             max_discount_pct=float(policy_dict.get("max_discount_pct", Policy.max_discount_pct)),
             fairness_block_cc_specific=bool(policy_dict.get("fairness_block_cc_specific", True)),
         )
+        budget_ms, err = _parse_budget(payload.get("latency_budget_ms"))
+        if err:
+            return jsonify({"error": err}), 400
 
         # Build one-row context DataFrame with proper types
         row = {
@@ -95,18 +176,47 @@ def recommend():
         }
         context_df = pd.DataFrame([row])
 
-        prop, price = get_models()
-        offers = optimize_offers(
-            context_rows=context_df,
-            propensity_model=prop,
-            price_model=price,
-            price_grid=list(map(float, price_buckets)),
-            policy=policy,
-            addon_costs=ADDON_COSTS,
-            addon_candidates=addons,
-            top_k=top_k,
-            list_price_map=price_list_map,
-        )
+        # Read the snapshot once: a concurrent /reload cannot mix models within this request
+        snapshot = MODELS.get()
+        price_grid = list(map(float, price_buckets))
+        remaining_s = (budget_ms - (time.perf_counter() - t0) * 1e3) / 1e3
+        answer = None
+        if not _acquire_slot(remaining_s):
+            # Budget ran out waiting for a slot: a precomputed table answers without one
+            answer = answer_from_table(
+                context_rows=context_df,
+                fallback_table=snapshot.fallback_table,
+                price_grid=price_grid,
+                policy=policy,
+                addon_costs=ADDON_COSTS,
+                addon_candidates=addons,
+                top_k=top_k,
+                list_price_map=price_list_map,
+            )
+            if answer is None:
+                # No usable table: wait for a slot after all; the spent budget leaves M1-only
+                _acquire_slot(None)
+        if answer is None:
+            try:
+                answer = optimize_offers_within_budget(
+                    context_rows=context_df,
+                    propensity_model=snapshot.propensity_model,
+                    price_model=snapshot.price_model,
+                    price_grid=price_grid,
+                    policy=policy,
+                    addon_costs=ADDON_COSTS,
+                    addon_candidates=addons,
+                    top_k=top_k,
+                    list_price_map=price_list_map,
+                    budget_ms=budget_ms,
+                    elapsed_ms=(time.perf_counter() - t0) * 1e3,
+                    # Each slot has its own cores; requests queued behind this one wait it out
+                    queued=_WAITING,
+                    fallback_table=snapshot.fallback_table,
+                )
+            finally:
+                _SCORING_SLOTS.release()
+        offers, tier, prices_used = answer
 
         return jsonify(
             {
@@ -114,8 +224,13 @@ def recommend():
                 "meta": {
                     "top_k": top_k,
                     "candidates_considered": len(addons),
-                    "price_buckets": price_buckets,
+                    "price_buckets": prices_used,
+                    "requested_price_buckets": price_buckets,
                     "list_price_map_used": True,
+                    "tier": tier,
+                    "model_version": snapshot.version,
+                    "latency_budget_ms": budget_ms,
+                    "elapsed_ms": round((time.perf_counter() - t0) * 1e3, 3),
                 },
             }
         ), 200
@@ -126,4 +241,9 @@ if __name__ == "__main__":
     port = int(os.getenv("PORT", "8080"))
     if os.getenv("WARMUP_ON_START", "1") == "1":
         get_models()
-    app.run(host="0.0.0.0", port=port, debug=bool(int(os.getenv("DEBUG", "0"))))
+    app.run(
+        host="0.0.0.0",
+        port=port,
+        debug=bool(int(os.getenv("DEBUG", "0"))),
+        threaded=True,
+    )